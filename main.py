@@ -1,139 +1,497 @@
+import os
+
+# Pin BLAS/OpenMP pools to one thread before numpy, CTranslate2 or ONNX Runtime load.
+# Parallelism comes from our own worker budget below, not from each library's pool.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_compression_ratio
+from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+import ctranslate2
 from piper.voice import PiperVoice
-from scipy.io.wavfile import read as read_wav
-from pydub import AudioSegment
+from piper.config import PiperConfig
+import onnxruntime
+import av
+import soxr
+import soundfile as sf
 import numpy as np
+import asyncio
+import functools
 import io
-import os
-import base64
 import json
-import wave
+import orjson
+import threading
+from collections import OrderedDict
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from voices import VOICES_DIR, QUANTIZED_VOICE_SUFFIX, PCMWriter, scan_voices
 
 # --- Configuration & Global Variables ---
-MODEL_SIZE = "base.en"
-VOICES_DIR = "voices"
+# Any faster-whisper model ID works; distil-small.en decodes ~2x faster than base.en
+# at comparable WER on short English utterances.
+MODEL_SIZE = os.getenv("VW_WHISPER", "distil-small.en")
+# Greedy decoding by default; raise VW_BEAM_SIZE for quality-sensitive deployments.
+STT_BEAM_SIZE = int(os.getenv("VW_BEAM_SIZE", "1"))
+STT_VAD_OPTIONS = VadOptions(min_silence_duration_ms=300)
 SAMPLE_RATE = 16000
+INT16_TO_FLOAT32 = np.float32(1.0 / 32768.0)
+N_CPU = os.cpu_count() or 1
+# Concurrent inference jobs. Each job gets an equal share of the cores so that
+# workers x threads-per-worker never exceeds N_CPU.
+N_WORKERS = max(1, min(N_CPU, int(os.getenv("VW_WORKERS", "2"))))
+THREADS_PER_WORKER = max(1, N_CPU // N_WORKERS)
+# Voices are loaded on first use; at most this many stay resident at once.
+TTS_VOICE_CACHE_SIZE = 4
+# Repeated phrases (greetings, error messages) skip phonemization, or synthesis entirely.
+TTS_PHONEME_CACHE_SIZE = 1024
+TTS_AUDIO_CACHE_SIZE = 64
 stt_model = None
-tts_voices = {}
 available_voices_info = {}
 
+# --- STT Micro-Batching ---
+# Requests arriving within STT_BATCH_WINDOW of each other share one encoder/decoder pass.
+STT_BATCH_WINDOW = 0.02
+STT_MAX_BATCH = int(os.getenv("VW_STT_MAX_BATCH", "8"))
+STT_BATCH_MAX_SAMPLES = 30 * SAMPLE_RATE
+# Same quality gates faster-whisper applies in transcribe(); batched results that fail
+# them are redone on the single-clip path, which has the temperature fallback.
+STT_NO_SPEECH_THRESHOLD = 0.6
+STT_LOG_PROB_THRESHOLD = -1.0
+STT_COMPRESSION_RATIO_THRESHOLD = 2.4
+stt_queue = None
+stt_batcher_task = None
+
+# --- Inference Offloading ---
+# CTranslate2 and ONNX Runtime release the GIL, so a thread pool lets clients overlap.
+# The semaphore bounds in-flight jobs across all connections to avoid OOM under bursts.
+inference_executor = None
+inference_slots = asyncio.Semaphore(N_WORKERS)
+
 # --- DEBUGGING FLAG ---
-DEBUG_SAVE_FILES = True
+# Set VW_DEBUG=1 to save intermediate audio files. Writes go to a background
+# thread so they never block inference.
+DEBUG_SAVE_FILES = os.getenv("VW_DEBUG", "0") == "1"
 DEBUG_FOLDER = "debug_audio"
+debug_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-writer")
+
+def _write_bytes(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def save_debug_file(name: str, data: bytes):
+    debug_executor.submit(_write_bytes, os.path.join(DEBUG_FOLDER, name), data)
+
+def save_debug_audio(name: str, samples: np.ndarray, sample_rate: int):
+    debug_executor.submit(sf.write, os.path.join(DEBUG_FOLDER, name), samples, sample_rate)
+
+# --- Server Settings ---
+# Upper bound on a single incoming WebSocket frame, and on the total audio of one turn.
+# 2 MiB holds ~2 minutes of Opus at the 128 kbps browsers record at most, well past
+# any single utterance, and is 8x tighter than uvicorn's 16 MiB default.
+WS_MAX_SIZE = 2 * 1024 * 1024
 
 # --- FastAPI App Initialization ---
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# --- Piper Voice Loading ---
+def create_tts_session_options() -> onnxruntime.SessionOptions:
+    """Builds ORT session options tuned for low-latency CPU synthesis."""
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    # Every cached voice owns its own intra-op pool, so up to TTS_VOICE_CACHE_SIZE pools
+    # of this size exist. Only N_WORKERS jobs run at once (inference_slots), so the busy
+    # threads stay within N_CPU as long as idle pools don't spin.
+    options.intra_op_num_threads = THREADS_PER_WORKER
+    options.inter_op_num_threads = 1
+    options.enable_cpu_mem_arena = True
+    options.enable_mem_pattern = True
+    # Spin-waiting only pays off when this session has the cores to itself; with several
+    # workers it steals cycles from CTranslate2 and the other sessions.
+    allow_spinning = "1" if N_WORKERS == 1 else "0"
+    options.add_session_config_entry("session.intra_op.allow_spinning", allow_spinning)
+    return options
+
+def select_tts_providers() -> tuple[list[str], list[dict]]:
+    """Uses the OpenVINO EP when onnxruntime-openvino is installed, else plain CPU."""
+    if "OpenVINOExecutionProvider" in onnxruntime.get_available_providers():
+        return ["OpenVINOExecutionProvider", "CPUExecutionProvider"], [{"device_type": "CPU"}, {}]
+    return ["CPUExecutionProvider"], [{}]
+
+def build_voice(model_path: str, config_path: str) -> PiperVoice:
+    """Loads a Piper voice with a tuned ORT session and primes its kernels.
+
+    If an INT8 build of the model (see quantize_voices.py) sits next to it, that is used instead.
+    """
+    with open(config_path, "r", encoding="utf-8") as config_file:
+        config = PiperConfig.from_dict(json.load(config_file))
+    quantized_path = model_path[:-len(".onnx")] + QUANTIZED_VOICE_SUFFIX
+    if os.path.exists(quantized_path):
+        model_path = quantized_path
+    providers, provider_options = select_tts_providers()
+    session = onnxruntime.InferenceSession(
+        model_path,
+        sess_options=create_tts_session_options(),
+        providers=providers,
+        provider_options=provider_options,
+    )
+    voice = PiperVoice(config=config, session=session)
+    # One throwaway synthesis so the first real request doesn't pay graph warm-up.
+    voice.synthesize("Hello.", PCMWriter())
+    return voice
+
+@functools.lru_cache(maxsize=TTS_VOICE_CACHE_SIZE)
+def cached_voice(voice_name: str) -> PiperVoice:
+    model_path, config_path = available_voices_info[voice_name]
+    print(f"Loading voice: {voice_name}")
+    return build_voice(model_path, config_path)
+
+# lru_cache isn't single-flight; without a per-voice lock, clients picking the same
+# uncached voice at once would each build a session and run warm-up.
+voice_load_locks = {}
+voice_load_locks_lock = threading.Lock()
+
+def load_voice(voice_name: str) -> PiperVoice:
+    """Returns the named voice, building it on first use and keeping the most recent few."""
+    if voice_name not in available_voices_info:
+        raise ValueError("Selected voice not found.")
+    with voice_load_locks_lock:
+        lock = voice_load_locks.setdefault(voice_name, threading.Lock())
+    with lock:
+        return cached_voice(voice_name)
+
+# --- Whisper Device Selection ---
+def select_stt_device() -> tuple[str, str]:
+    """Picks the fastest (device, compute_type) pair CTranslate2 supports here."""
+    if ctranslate2.get_cuda_device_count() > 0:
+        cuda_types = ctranslate2.get_supported_compute_types("cuda")
+        if "int8_float16" in cuda_types:
+            return "cuda", "int8_float16"
+    cpu_types = ctranslate2.get_supported_compute_types("cpu")
+    # int8_bfloat16 is only reported on CPUs with BF16 support (e.g. Sapphire Rapids, Zen 4).
+    if "int8_bfloat16" in cpu_types:
+        return "cpu", "int8_bfloat16"
+    return "cpu", "int8"
+
 # --- Model Loading (on server startup) ---
 @app.on_event("startup")
 async def startup_event():
-    global stt_model, tts_voices, available_voices_info
+    global stt_model, available_voices_info, inference_executor, stt_queue, stt_batcher_task
+    inference_executor = ThreadPoolExecutor(max_workers=N_WORKERS, thread_name_prefix="inference")
+    stt_queue = asyncio.Queue()
+    stt_batcher_task = asyncio.create_task(stt_batcher())
     if DEBUG_SAVE_FILES:
         os.makedirs(DEBUG_FOLDER, exist_ok=True)
         print(f"Debug mode is ON. Saving files to '{DEBUG_FOLDER}/'")
-    print("Loading Whisper STT model...")
-    stt_model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
+    device, compute_type = select_stt_device()
+    print(f"Loading Whisper STT model on {device} ({compute_type})...")
+    stt_model = WhisperModel(
+        MODEL_SIZE,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=THREADS_PER_WORKER,
+        num_workers=N_WORKERS,
+    )
     print("Whisper model loaded.")
     print("Scanning for Piper TTS voices...")
     if not os.path.isdir(VOICES_DIR):
         raise RuntimeError(f"The voices directory '{VOICES_DIR}' was not found.")
-    for file in sorted(os.listdir(VOICES_DIR)):
-        if file.endswith(".onnx"):
-            base_name = file.replace(".onnx", "")
-            config_path = os.path.join(VOICES_DIR, f"{base_name}.onnx.json")
-            if os.path.exists(config_path):
-                try:
-                    parts = base_name.split('-')
-                    lang_region = parts[0].split('_')[1]
-                    name = parts[1].replace("_", " ").title()
-                    quality = parts[2]
-                    friendly_name = f"{name} ({lang_region}, {quality})"
-                except IndexError: friendly_name = base_name
-                print(f"Loading voice: {friendly_name}")
-                model_path = os.path.join(VOICES_DIR, file)
-                voice = PiperVoice.load(model_path, config_path=config_path)
-                tts_voices[friendly_name] = voice
-                available_voices_info[friendly_name] = base_name
-    print(f"Loaded {len(tts_voices)} TTS voices successfully.")
+    available_voices_info = scan_voices()
+    print(f"Found {len(available_voices_info)} TTS voices: {list(available_voices_info.keys())}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if stt_batcher_task is not None:
+        stt_batcher_task.cancel()
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False, cancel_futures=True)
+    debug_executor.shutdown(wait=True)
 
 @app.get("/")
 async def read_root():
     return FileResponse('static/index.html')
 
-def transcribe_audio_stream(audio_bytes: bytes) -> str:
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
+    """Decodes a WebM/Opus blob in-process to 16 kHz mono float32 samples."""
+    pcm = bytearray()
+    with av.open(io.BytesIO(audio_bytes)) as container:
+        stream = container.streams.audio[0]
+        in_rate = stream.rate
+        # Normalise every frame to packed int16 mono at the source rate and append its
+        # raw bytes; planes can be padded, so only take samples * 2 bytes.
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=in_rate)
+        for frame in container.decode(stream):
+            for out_frame in resampler.resample(frame):
+                pcm += memoryview(out_frame.planes[0])[:out_frame.samples * 2]
+        for out_frame in resampler.resample(None):
+            pcm += memoryview(out_frame.planes[0])[:out_frame.samples * 2]
+    # Zero-copy view over the accumulated buffer; no per-frame arrays or concatenate.
+    data = np.frombuffer(pcm, dtype=np.int16)
+    if in_rate != SAMPLE_RATE and data.size:
+        data = soxr.resample(data, in_rate, SAMPLE_RATE, quality="QQ")
+    # Single fused cast-and-scale pass; no int16->float32 temporary, no per-sample divide.
+    return np.multiply(data, INT16_TO_FLOAT32, dtype=np.float32)
+
+def load_audio_stream(audio_bytes: bytes) -> np.ndarray | None:
     if DEBUG_SAVE_FILES:
-        with open(os.path.join(DEBUG_FOLDER, "received_audio.webm"), "wb") as f: f.write(audio_bytes)
+        save_debug_file("received_audio.webm", audio_bytes)
     try:
-        webm_audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format="webm")
-        webm_audio = webm_audio.set_frame_rate(SAMPLE_RATE).set_channels(1)
-        wav_buffer = io.BytesIO()
-        webm_audio.export(wav_buffer, format="wav")
-        wav_buffer.seek(0)
-        if DEBUG_SAVE_FILES:
-            with open(os.path.join(DEBUG_FOLDER, "converted_audio.wav"), "wb") as f: f.write(wav_buffer.getvalue())
-            wav_buffer.seek(0)
+        audio_float32 = decode_audio(audio_bytes)
     except Exception as e:
         print(f"Error during audio conversion: {e}")
-        return ""
+        return None
+    if DEBUG_SAVE_FILES:
+        save_debug_audio("converted_audio.wav", audio_float32, SAMPLE_RATE)
+    return audio_float32
+
+def transcribe_audio(speech_float32: np.ndarray) -> str:
+    """Transcribes speech that remove_silence has already cut, so VAD isn't run twice."""
     print("Transcribing audio...")
-    samplerate, data = read_wav(wav_buffer)
-    audio_float32 = data.astype(np.float32) / np.iinfo(data.dtype).max
-    segments, _ = stt_model.transcribe(audio_float32, beam_size=5)
+    segments, _ = stt_model.transcribe(
+        speech_float32,
+        beam_size=STT_BEAM_SIZE,
+        vad_filter=False,
+        condition_on_previous_text=False,
+        without_timestamps=True,
+    )
     transcribed_text = "".join(segment.text for segment in segments).strip()
     print(f"Transcribed text: {transcribed_text}")
     return transcribed_text
 
-def synthesize_speech_stream(text: str, voice_name: str) -> bytes:
-    """Synthesizes speech using the correct in-memory wave object."""
+def remove_silence(audio_float32: np.ndarray) -> np.ndarray | None:
+    """Applies the same Silero VAD cut as transcribe(vad_filter=True); None if no speech."""
+    speech_timestamps = get_speech_timestamps(audio_float32, STT_VAD_OPTIONS)
+    if not speech_timestamps:
+        return None
+    chunks, _ = collect_chunks(audio_float32, speech_timestamps)
+    return np.concatenate(chunks)
+
+def transcribe_audio_batch(audios: list[np.ndarray]) -> list[str]:
+    """Transcribes several clips, sharing one CTranslate2 encode/generate call where possible.
+
+    Each clip is VAD-cut once up front and the cut is reused on every path. Lone
+    clips, clips whose speech is longer than Whisper's 30 s window, and batched
+    results that fail faster-whisper's quality checks take the regular transcribe
+    path instead.
+    """
+    results = [None] * len(audios)
+    speech_audios = [remove_silence(audio) for audio in audios]
+    speech = {}
+    for i, speech_audio in enumerate(speech_audios):
+        if speech_audio is None:
+            results[i] = ""
+        elif len(speech_audio) <= STT_BATCH_MAX_SAMPLES:
+            speech[i] = speech_audio
+    if len(speech) < 2:
+        speech = {}
+    for i, speech_audio in enumerate(speech_audios):
+        if results[i] is None and i not in speech:
+            results[i] = transcribe_audio(speech_audio)
+    if not speech:
+        return results
+
+    print(f"Transcribing a batch of {len(speech)} clips...")
+    batch_indices = list(speech)
+    features = np.stack([pad_or_trim(stt_model.feature_extractor(speech[i])) for i in batch_indices])
+    encoder_output = stt_model.encode(features)
+    multilingual = stt_model.model.is_multilingual
+    if multilingual:
+        # Detect per clip, as transcribe() does, rather than forcing one language on the batch.
+        languages = [probs[0][0][2:-2] for probs in stt_model.model.detect_language(encoder_output)]
+    else:
+        languages = ["en"] * len(batch_indices)
+    tokenizers = [
+        Tokenizer(stt_model.hf_tokenizer, multilingual, task="transcribe", language=language)
+        for language in languages
+    ]
+    generated = stt_model.model.generate(
+        encoder_output,
+        [stt_model.get_prompt(tokenizer, [], without_timestamps=True) for tokenizer in tokenizers],
+        beam_size=STT_BEAM_SIZE,
+        max_length=stt_model.max_length,
+        return_scores=True,
+        return_no_speech_prob=True,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+    )
+    for i, tokenizer, result in zip(batch_indices, tokenizers, generated):
+        tokens = [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+        avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+        if result.no_speech_prob > STT_NO_SPEECH_THRESHOLD and avg_logprob < STT_LOG_PROB_THRESHOLD:
+            results[i] = ""
+            continue
+        text = tokenizer.decode(tokens).strip()
+        if avg_logprob < STT_LOG_PROB_THRESHOLD or get_compression_ratio(text) > STT_COMPRESSION_RATIO_THRESHOLD:
+            results[i] = transcribe_audio(speech[i])
+            continue
+        results[i] = text
+        print(f"Transcribed text: {text}")
+    return results
+
+async def run_stt_batch(batch: list[tuple[np.ndarray, asyncio.Future]]):
+    """Transcribes one drained batch on the worker pool. The caller has taken an inference slot."""
+    loop = asyncio.get_running_loop()
+    audios = [audio for audio, _ in batch]
+    try:
+        texts = await loop.run_in_executor(inference_executor, transcribe_audio_batch, audios)
+    except Exception as e:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+    finally:
+        inference_slots.release()
+    for (_, future), text in zip(batch, texts):
+        if not future.done():
+            future.set_result(text)
+
+async def stt_batcher():
+    """Drains the STT queue in short windows, running up to N_WORKERS batches at once."""
+    loop = asyncio.get_running_loop()
+    running = set()
+    while True:
+        batch = [await stt_queue.get()]
+        # Take a worker slot before collecting, so requests that arrive while every
+        # worker is busy join this batch rather than waiting behind it.
+        await inference_slots.acquire()
+        deadline = loop.time() + STT_BATCH_WINDOW
+        while len(batch) < STT_MAX_BATCH:
+            if not stt_queue.empty():
+                batch.append(stt_queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(stt_queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        task = asyncio.create_task(run_stt_batch(batch))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+async def transcribe_queued(audio_float32: np.ndarray) -> str:
+    future = asyncio.get_running_loop().create_future()
+    await stt_queue.put((audio_float32, future))
+    return await future
+
+@functools.lru_cache(maxsize=TTS_PHONEME_CACHE_SIZE)
+def phoneme_ids_for(voice_name: str, text: str) -> tuple[tuple[int, ...], ...]:
+    """Phonemizes text for a voice, returning one phoneme-id sequence per sentence."""
+    voice = load_voice(voice_name)
+    return tuple(tuple(voice.phonemes_to_ids(phonemes)) for phonemes in voice.phonemize(text))
+
+synthesized_audio_cache = OrderedDict()
+synthesized_audio_cache_lock = threading.Lock()
+
+def get_cached_audio(voice_name: str, text: str) -> tuple[bytes, ...] | None:
+    with synthesized_audio_cache_lock:
+        chunks = synthesized_audio_cache.get((voice_name, text))
+        if chunks is not None:
+            synthesized_audio_cache.move_to_end((voice_name, text))
+        return chunks
+
+def cache_audio(voice_name: str, text: str, chunks: tuple[bytes, ...]):
+    with synthesized_audio_cache_lock:
+        synthesized_audio_cache[(voice_name, text)] = chunks
+        synthesized_audio_cache.move_to_end((voice_name, text))
+        while len(synthesized_audio_cache) > TTS_AUDIO_CACHE_SIZE:
+            synthesized_audio_cache.popitem(last=False)
+
+def synthesize_speech_stream(text: str, voice_name: str) -> Iterator[bytes]:
+    """Yields raw int16 mono PCM chunks as Piper produces them, one per sentence."""
     print(f"Synthesizing speech with voice: {voice_name}")
-    if voice_name not in tts_voices:
-        raise ValueError("Selected voice not found.")
-    
-    voice = tts_voices[voice_name]
-    
-    # 1. Create an in-memory binary buffer.
-    audio_stream = io.BytesIO()
-    
-    # 2. Use wave.open to wrap the buffer. This creates the object that
-    #    piper-tts expects, which will write its WAV data into our buffer.
-    with wave.open(audio_stream, 'wb') as wav_file:
-        voice.synthesize(text, wav_file)
-    
+    voice = load_voice(voice_name)
+    chunks = get_cached_audio(voice_name, text)
+    if chunks is not None:
+        yield from chunks
+    else:
+        chunks = []
+        for phoneme_ids in phoneme_ids_for(voice_name, text):
+            chunk = voice.synthesize_ids_to_raw(list(phoneme_ids))
+            chunks.append(chunk)
+            yield chunk
+        cache_audio(voice_name, text, tuple(chunks))
+
     if DEBUG_SAVE_FILES:
-        with open(os.path.join(DEBUG_FOLDER, "synthesized_output.wav"), "wb") as f:
-            f.write(audio_stream.getvalue())
-    
-    audio_stream.seek(0)
-    return audio_stream.read()
+        samples = np.frombuffer(b"".join(chunks), dtype=np.int16)
+        save_debug_audio("synthesized_output.wav", samples, voice.config.sample_rate)
 
 # --- WebSocket Endpoint  ---
+async def send_json(websocket: WebSocket, data: dict):
+    """Sends a JSON control frame, encoded with orjson instead of the stdlib encoder."""
+    await websocket.send_text(orjson.dumps(data).decode())
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("WebSocket client connected.")
-    await websocket.send_json({"type": "voices", "data": list(available_voices_info.keys())})
+    await send_json(websocket, {"type": "voices", "data": list(available_voices_info.keys())})
+    # Protocol per turn: a text header {"voice": ...}, one or more binary audio
+    # frames, then a text {"end": true}. Replies are a JSON result, an "audio_start"
+    # header, the synthesized int16 PCM as binary frames and a closing "audio_end".
+    loop = asyncio.get_running_loop()
+    voice = None
+    audio_buffer = bytearray()
     try:
         while True:
-            message = await websocket.receive_json()
-            voice = message.get("voice")
-            audio_b64 = message.get("audio")
-            if not voice or not audio_b64:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                if not voice:
+                    continue
+                if len(audio_buffer) + len(message["bytes"]) > WS_MAX_SIZE:
+                    # Abandon the turn; its remaining frames and end marker are ignored.
+                    voice = None
+                    audio_buffer.clear()
+                    await send_json(websocket, {"type": "error", "message": "Recording is too long. Please try a shorter one."})
+                    continue
+                audio_buffer.extend(message["bytes"])
+                continue
+            header = orjson.loads(message["text"])
+            if header.get("voice"):
+                voice = header["voice"]
+                audio_buffer.clear()
+                continue
+            if not header.get("end") or not voice or not audio_buffer:
                 continue
-            await websocket.send_json({"type": "status", "message": "Received audio. Transcribing..."})
-            audio_bytes = base64.b64decode(audio_b64)
-            transcribed_text = transcribe_audio_stream(audio_bytes)
+            audio_bytes = bytes(audio_buffer)
+            audio_buffer.clear()
+            await send_json(websocket, {"type": "status", "message": "Received audio. Transcribing..."})
+            async with inference_slots:
+                audio_float32 = await loop.run_in_executor(inference_executor, load_audio_stream, audio_bytes)
+            transcribed_text = ""
+            if audio_float32 is not None and audio_float32.size:
+                transcribed_text = await transcribe_queued(audio_float32)
             if transcribed_text:
-                await websocket.send_json({"type": "status", "message": "Synthesizing new voice..."})
-                synthesized_bytes = synthesize_speech_stream(transcribed_text, voice)
-                synthesized_b64 = base64.b64encode(synthesized_bytes).decode('utf-8')
-                await websocket.send_json({"type": "result", "text": transcribed_text, "audio": synthesized_b64})
+                await send_json(websocket, {"type": "status", "message": "Synthesizing new voice..."})
+                # The first request for a voice loads it, so keep that off the event loop too.
+                async with inference_slots:
+                    piper_voice = await loop.run_in_executor(inference_executor, load_voice, voice)
+                sample_rate = piper_voice.config.sample_rate
+                await send_json(websocket, {"type": "result", "text": transcribed_text})
+                await send_json(websocket, {"type": "audio_start", "sample_rate": sample_rate, "channels": 1, "dtype": "int16"})
+                chunks = synthesize_speech_stream(transcribed_text, voice)
+                while True:
+                    # Pull one sentence at a time from the worker so chunks stream as they finish.
+                    async with inference_slots:
+                        chunk = await loop.run_in_executor(inference_executor, next, chunks, None)
+                    if chunk is None:
+                        break
+                    await websocket.send_bytes(chunk)
+                await send_json(websocket, {"type": "audio_end"})
             else:
-                 await websocket.send_json({"type": "result", "text": "No speech detected.", "audio": None})
+                await send_json(websocket, {"type": "result", "text": "No speech detected."})
     except WebSocketDisconnect:
         print("WebSocket client disconnected.")
     except Exception as e:
@@ -142,4 +500,14 @@ async def websocket_endpoint(websocket: WebSocket):
 
 # --- To run the server ---
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        # "auto" picks uvloop and httptools when installed (uvloop isn't available on Windows).
+        loop="auto",
+        http="auto",
+        ws="websockets",
+        ws_max_size=WS_MAX_SIZE,
+        reload=False,
+    )
\ No newline at end of file
@@ -0,0 +1,60 @@
+import nncf
+import numpy as np
+import onnx
+from piper.voice import PiperVoice
+from voices import QUANTIZED_VOICE_SUFFIX, scan_voices_dir
+
+# --- Configuration ---
+CALIBRATION_SENTENCES = [
+    "Hello, how are you doing today?",
+    "The quick brown fox jumps over the lazy dog.",
+    "Please speak clearly into the microphone.",
+    "I didn't catch that, could you say it again?",
+    "It is a beautiful morning, and the coffee is ready.",
+    "Thank you for using the voice changer.",
+    "Numbers like one, two, three and forty two are common too.",
+    "What time does the meeting start tomorrow afternoon?",
+]
+
+
+def build_calibration_set(voice):
+    """Phonemizes the calibration sentences into Piper's ONNX input tensors."""
+    inputs = []
+    noise_scale = voice.config.noise_scale
+    length_scale = voice.config.length_scale
+    noise_w = voice.config.noise_w
+    for text in CALIBRATION_SENTENCES:
+        for phonemes in voice.phonemize(text):
+            phoneme_ids = np.expand_dims(np.array(voice.phonemes_to_ids(phonemes), dtype=np.int64), 0)
+            item = {
+                "input": phoneme_ids,
+                "input_lengths": np.array([phoneme_ids.shape[1]], dtype=np.int64),
+                "scales": np.array([noise_scale, length_scale, noise_w], dtype=np.float32),
+            }
+            if voice.config.num_speakers > 1:
+                item["sid"] = np.array([0], dtype=np.int64)
+            inputs.append(item)
+    return inputs
+
+
+def quantize_voice(model_path, config_path):
+    """Runs NNCF 8-bit post-training quantization on one Piper voice."""
+    output_path = model_path[:-len(".onnx")] + QUANTIZED_VOICE_SUFFIX
+    print(f"Quantizing {model_path} -> {output_path}")
+    voice = PiperVoice.load(model_path, config_path=config_path)
+    calibration_dataset = nncf.Dataset(build_calibration_set(voice))
+    quantized_model = nncf.quantize(
+        onnx.load(model_path),
+        calibration_dataset,
+        subset_size=len(CALIBRATION_SENTENCES),
+    )
+    onnx.save(quantized_model, output_path)
+
+
+def main():
+    for voice in scan_voices_dir().values():
+        quantize_voice(voice.model, voice.config)
+
+
+if __name__ == "__main__":
+    main()
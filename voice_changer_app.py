@@ -1,19 +1,22 @@
 import customtkinter as ctk
 import sounddevice as sd
-from scipy.io.wavfile import write, read as read_wav  # Import 'read' explicitly
+import numpy as np
+import webrtcvad
 from piper.voice import PiperVoice
 from faster_whisper import WhisperModel
 import threading
 import os
-import wave
+from voices import VOICES_DIR, PCMWriter, scan_voices
 
 # --- Configuration ---
 MODEL_SIZE = "base.en"  # Whisper model for transcription
-VOICES_DIR = "voices"  # Folder where Piper models are stored
-AUDIO_FILE = "temp_recording.wav"
-TTS_OUTPUT_FILE = "tts_output.wav"
 SAMPLE_RATE = 16000
-RECORD_SECONDS = 10
+INT16_TO_FLOAT32 = np.float32(1.0 / 32768.0)
+RECORD_SECONDS = 10  # Upper bound; recording normally stops at the end of speech
+VAD_FRAME_MS = 20  # webrtcvad accepts 10, 20 or 30 ms frames
+VAD_FRAME_SAMPLES = SAMPLE_RATE * VAD_FRAME_MS // 1000
+VAD_AGGRESSIVENESS = 2
+TRAILING_SILENCE_MS = 500
 
 # --- Global Placeholders for Models ---
 stt_model = None
@@ -23,19 +26,34 @@ current_voice_name = None
 
 # --- Core Functions ---
 def record_audio():
-    """Records audio from the microphone for a fixed duration."""
+    """Records audio from the microphone until the speaker pauses, up to RECORD_SECONDS."""
     print("Recording...")
-    recording = sd.rec(int(RECORD_SECONDS * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype='int16')
-    sd.wait()
-    write(AUDIO_FILE, SAMPLE_RATE, recording)
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    max_frames = RECORD_SECONDS * 1000 // VAD_FRAME_MS
+    silence_limit = TRAILING_SILENCE_MS // VAD_FRAME_MS
+    frames = []
+    heard_speech = False
+    silent_frames = 0
+    with sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16', blocksize=VAD_FRAME_SAMPLES) as stream:
+        while len(frames) < max_frames:
+            frame, _ = stream.read(VAD_FRAME_SAMPLES)
+            frames.append(frame.reshape(-1))
+            if vad.is_speech(frame.tobytes(), SAMPLE_RATE):
+                heard_speech = True
+                silent_frames = 0
+            elif heard_speech:
+                silent_frames += 1
+                if silent_frames >= silence_limit:
+                    break
     print("Recording finished.")
-    return AUDIO_FILE
+    return np.concatenate(frames)
 
 
-def transcribe_audio(file_path):
-    """Transcribes the recorded audio file to text using Whisper."""
+def transcribe_audio(recording):
+    """Transcribes the recorded int16 samples to text using Whisper."""
     print("Transcribing...")
-    segments, _ = stt_model.transcribe(file_path, beam_size=5)
+    audio_float32 = np.multiply(recording, INT16_TO_FLOAT32, dtype=np.float32)
+    segments, _ = stt_model.transcribe(audio_float32, beam_size=5)
     transcribed_text = "".join(segment.text for segment in segments).strip()
     print(f"Transcribed text: {transcribed_text}")
     return transcribed_text
@@ -64,7 +82,7 @@ class App(ctk.CTk):
         self.voice_menu.pack(pady=5, padx=40, fill="x")
 
         # --- Main Controls and Status Display ---
-        self.status_label = ctk.CTkLabel(self, text="Press the button and speak for 5 seconds.", wraplength=400,
+        self.status_label = ctk.CTkLabel(self, text="Press the button and speak. Recording stops when you pause.", wraplength=400,
                                          font=("Helvetica", 16))
         self.status_label.pack(pady=20, padx=20)
 
@@ -83,28 +101,11 @@ class App(ctk.CTk):
 
     def scan_for_voices(self):
         """Scans the voices directory to find available Piper models."""
-        voices = {}
         if not os.path.isdir(VOICES_DIR):
             os.makedirs(VOICES_DIR)
             return {}
 
-        for file in sorted(os.listdir(VOICES_DIR)):
-            if file.endswith(".onnx"):
-                base_name = file.replace(".onnx", "")
-                if os.path.exists(os.path.join(VOICES_DIR, f"{base_name}.onnx.json")):
-                    try:
-                        parts = base_name.split('-')
-                        lang_region = parts[0].split('_')[1]
-                        name = parts[1].replace("_", " ").title()
-                        quality = parts[2]
-                        friendly_name = f"{name} ({lang_region}, {quality})"
-                    except IndexError:
-                        friendly_name = base_name
-
-                    voices[friendly_name] = {
-                        "model": os.path.join(VOICES_DIR, file),
-                        "config": os.path.join(VOICES_DIR, f"{base_name}.onnx.json")
-                    }
+        voices = scan_voices()
         print(f"Found voices: {list(voices.keys())}")
         return voices
 
@@ -124,32 +125,28 @@ class App(ctk.CTk):
             self.update_idletasks()
 
             voice_files = self.available_voices[selected_voice_friendly_name]
-            current_voice_model = PiperVoice.load(voice_files["model"], config_path=voice_files["config"])
+            current_voice_model = PiperVoice.load(voice_files.model, config_path=voice_files.config)
             current_voice_name = selected_voice_friendly_name
             print("Voice loaded.")
 
         self.status_label.configure(text="Synthesizing audio...")
-        with wave.open(TTS_OUTPUT_FILE, 'wb') as wav_file:
-            current_voice_model.synthesize(text, wav_file)
+        pcm_writer = PCMWriter()
+        current_voice_model.synthesize(text, pcm_writer)
 
         self.status_label.configure(text="Speaking...")
-        # +++ THIS IS THE CORRECTED LINE +++
-        fs, data = read_wav(TTS_OUTPUT_FILE)
-        sd.play(data, fs)
-        sd.wait()
-
-        if os.path.exists(TTS_OUTPUT_FILE):
-            os.remove(TTS_OUTPUT_FILE)
+        samples = np.frombuffer(pcm_writer.frames, dtype=np.int16)
+        with sd.OutputStream(samplerate=current_voice_model.config.sample_rate, channels=1, dtype='int16') as stream:
+            stream.write(samples)
 
     def process_voice(self):
         """The main workflow: record -> transcribe -> speak."""
         self.record_button.configure(state="disabled", text="Processing...")
 
         self.status_label.configure(text="Recording...")
-        audio_file = record_audio()
+        recording = record_audio()
 
         self.status_label.configure(text="Transcribing...")
-        transcribed_text = transcribe_audio(audio_file)
+        transcribed_text = transcribe_audio(recording)
 
         self.textbox.configure(state="normal")
         self.textbox.delete("0.0", "end")
@@ -158,11 +155,8 @@ class App(ctk.CTk):
 
         self.speak_text_piper(transcribed_text)
 
-        if os.path.exists(audio_file):
-            os.remove(audio_file)
-
         self.record_button.configure(state="normal", text="Record & Speak")
-        self.status_label.configure(text="Press the button and speak for 60 seconds.")
+        self.status_label.configure(text="Press the button and speak. Recording stops when you pause.")
 
     def start_processing_thread(self):
         """Runs the main process in a separate thread to keep the GUI from freezing."""
@@ -0,0 +1,85 @@
+import functools
+import json
+import os
+from typing import NamedTuple
+
+# --- Configuration ---
+VOICES_DIR = "voices"  # Folder where Piper models are stored
+QUANTIZED_VOICE_SUFFIX = ".int8.onnx"  # INT8 builds written by quantize_voices.py
+# Kept outside VOICES_DIR so writing it doesn't change the directory mtime it is keyed on.
+VOICES_MANIFEST = "voices.manifest.json"
+
+
+class PCMWriter:
+    """Minimal wave.Wave_write stand-in that collects Piper's raw int16 PCM without a RIFF header."""
+
+    def __init__(self):
+        self.frames = bytearray()
+        self.channels = 1
+        self.sample_width = 2
+        self.frame_rate = 0
+
+    def setnchannels(self, channels: int):
+        self.channels = channels
+
+    def setsampwidth(self, sample_width: int):
+        self.sample_width = sample_width
+
+    def setframerate(self, frame_rate: int):
+        self.frame_rate = frame_rate
+
+    def writeframes(self, data: bytes):
+        self.frames.extend(data)
+
+
+class VoiceEntry(NamedTuple):
+    model: str
+    config: str
+
+
+def friendly_voice_name(base_name):
+    """Turns e.g. 'en_US-amy-medium' into 'Amy (US, medium)'."""
+    try:
+        parts = base_name.split('-')
+        lang_region = parts[0].split('_')[1]
+        name = parts[1].replace("_", " ").title()
+        quality = parts[2]
+        return f"{name} ({lang_region}, {quality})"
+    except IndexError:
+        return base_name
+
+
+def scan_voices_dir():
+    """Maps each voice's friendly name to its model and config paths."""
+    voices = {}
+    for file in sorted(os.listdir(VOICES_DIR)):
+        if file.endswith(".onnx") and not file.endswith(QUANTIZED_VOICE_SUFFIX):
+            base_name = file.replace(".onnx", "")
+            config_path = os.path.join(VOICES_DIR, f"{base_name}.onnx.json")
+            if os.path.exists(config_path):
+                voices[friendly_voice_name(base_name)] = VoiceEntry(os.path.join(VOICES_DIR, file), config_path)
+    return voices
+
+
+@functools.cache
+def scan_voices() -> dict[str, VoiceEntry]:
+    """Returns the available voices, scanned at most once per process.
+
+    The result is persisted to VOICES_MANIFEST and reused across restarts for as
+    long as the voices directory's mtime is unchanged.
+    """
+    mtime_ns = os.stat(VOICES_DIR).st_mtime_ns
+    try:
+        with open(VOICES_MANIFEST, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("mtime_ns") == mtime_ns:
+            return {name: VoiceEntry(*paths) for name, paths in manifest["voices"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    voices = scan_voices_dir()
+    try:
+        with open(VOICES_MANIFEST, "w", encoding="utf-8") as manifest_file:
+            json.dump({"mtime_ns": mtime_ns, "voices": voices}, manifest_file, indent=2)
+    except OSError as e:
+        print(f"Could not write voice manifest: {e}")
+    return voices